@@ -0,0 +1,44 @@
+import os
+import pytest
+
+
+# Benchmark baselines are stored per machine type, see README.md.
+# Comparing against them is opt-in by setting this environment variable, eg. on a dedicated CI runner.
+BENCHMARK_COMPARE_ENV = 'FARA_BENCHMARK_COMPARE'
+BENCHMARK_STORAGE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'fara_foreign_principals', 'tests', 'benchmarks')
+BENCHMARK_COMPARE_FAIL = 'min:100%'
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """
+    Points pytest-benchmark at the stored baselines. When FARA_BENCHMARK_COMPARE is set,
+    also compares against the latest one saved for this machine type.
+    Otherwise, or without a baseline for it, benchmarks only run.
+    Runs before the plugin reads its options.
+    """
+    if not config.pluginmanager.hasplugin('benchmark'):
+        return
+    from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+
+    config.option.benchmark_storage = BENCHMARK_STORAGE
+    config.option.benchmark_disable_gc = True
+
+    machine_storage = os.path.join(BENCHMARK_STORAGE, get_machine_id())
+    has_baseline = os.path.isdir(machine_storage) and any(
+        file_name.endswith('.json') for file_name in os.listdir(machine_storage))
+    compare_enabled = os.environ.get(BENCHMARK_COMPARE_ENV, '') not in ('', '0')
+    if compare_enabled and has_baseline and not config.option.benchmark_compare:
+        config.option.benchmark_compare = True
+        if not config.option.benchmark_compare_fail:
+            config.option.benchmark_compare_fail = [parse_compare_fail(BENCHMARK_COMPARE_FAIL)]
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.pluginmanager.hasplugin('benchmark'):
+        return
+    skip_benchmark = pytest.mark.skip(reason='pytest-benchmark is not enabled.')
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip_benchmark)
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import random
+import re
+import unicodedata
+import zlib
+
+from .fara_exceptions import UnexpectedValueError
+from .json_storage import dump_json_atomically
+
+
+# Mersenne prime used as modulus for the MinHash permutations.
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Words that carry no identity for a foreign principal name.
+NAME_STOPWORDS = frozenset([
+    'the', 'of', 'and', 'inc', 'llc', 'ltd', 'co', 'corp', 'corporation',
+    'company', 'limited', 'plc', 'sa', 'ag', 'gmbh',
+])
+
+
+def normalize_text(text, stopwords=frozenset()):
+    """
+    Lowercases, strips accents and punctuation, drops stopwords and collapses whitespace.
+    Returns an empty string for None.
+    """
+    if text is None:
+        return ''
+    text = text.replace('\\u00a0', ' ').replace('\xa0', ' ')
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return ' '.join(word for word in text.split() if word not in stopwords)
+
+
+def normalize_name(name):
+    return normalize_text(name, NAME_STOPWORDS)
+
+
+def normalize_address(address):
+    # Address can come in as the joined item value or the raw list of lines.
+    if isinstance(address, (list, tuple)):
+        address = ' '.join(line for line in address if line)
+    return normalize_text(address)
+
+
+def shingles(text, n=3):
+    """
+    Returns the set of character n-grams of text.
+    Text shorter than n is returned as a single shingle so short names still index.
+    """
+    if not text:
+        return set()
+    padded = ' {text} '.format(text=text)
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class MinHasher(object):
+    """
+    Computes MinHash signatures for shingle sets.
+    Hash functions are derived from a fixed seed and crc32 so signatures are
+    identical between processes, which lets a stored index be reused across crawls.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        self.num_perm = num_perm
+        self.seed = seed
+        generator = random.Random(seed)
+        self.permutations = [
+            (generator.randint(1, MERSENNE_PRIME - 1), generator.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return [MAX_HASH] * self.num_perm
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+        return [
+            min(((a * value + b) % MERSENNE_PRIME) & MAX_HASH for value in hashes)
+            for a, b in self.permutations
+        ]
+
+    @staticmethod
+    def similarity(signature_1, signature_2):
+        """
+        Estimated jaccard similarity of the shingle sets behind two signatures.
+        """
+        if not signature_1 or len(signature_1) != len(signature_2):
+            return 0.0
+        matches = sum(1 for x, y in zip(signature_1, signature_2) if x == y)
+        return matches / len(signature_1)
+
+
+class ForeignPrincipalIndex(object):
+    """
+    MinHash-LSH index over normalized foreign principal names and addresses.
+
+    Names are split into bands of the signature, keyed by country so principals only
+    match within the country they represent. Records sharing any band bucket are
+    candidates and only those are scored, so a lookup does not compare against
+    every record in the index. A new record joins the cluster of its best match and
+    clusters are never merged afterwards, so an id written onto an item stays valid.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.7, address_weight=0.25, seed=1):
+        if num_perm % bands != 0:
+            raise UnexpectedValueError(
+                'num_perm {num_perm} is not divisible by bands {bands}.'.format(
+                    num_perm=num_perm, bands=bands))
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.address_weight = address_weight
+
+        # record id -> {'key', 'country', 'name', 'address', 'cluster'}
+        self.records = []
+        # 'normalized country|normalized name|normalized address' -> record id
+        self.record_keys = {}
+        # 'country:band:hash' -> list of record ids
+        self.buckets = {}
+        self.next_cluster_id = 1
+
+    def band_keys(self, signature, normalized_country):
+        for band in range(self.bands):
+            band_values = signature[band * self.rows:(band + 1) * self.rows]
+            yield '{country}:{band}:{hash}'.format(
+                country=normalized_country, band=band, hash=zlib.crc32(json.dumps(band_values).encode('utf-8')))
+
+    def score(self, name_signature, address_signature, record):
+        score = self.hasher.similarity(name_signature, record['name'])
+        if address_signature is not None and record['address'] is not None:
+            address_score = self.hasher.similarity(address_signature, record['address'])
+            score = (1 - self.address_weight) * score + self.address_weight * address_score
+        return score
+
+    def signatures(self, normalized_name, normalized_address):
+        name_signature = self.hasher.signature(shingles(normalized_name))
+        if normalized_address:
+            address_signature = self.hasher.signature(shingles(normalized_address))
+        else:
+            address_signature = None
+        return name_signature, address_signature
+
+    def match_signatures(self, name_signature, address_signature, normalized_country):
+        candidate_ids = set()
+        for band_key in self.band_keys(name_signature, normalized_country):
+            candidate_ids.update(self.buckets.get(band_key, ()))
+
+        cluster_scores = {}
+        for record_id in candidate_ids:
+            record = self.records[record_id]
+            score = self.score(name_signature, address_signature, record)
+            if score >= self.threshold:
+                cluster_id = record['cluster']
+                cluster_scores[cluster_id] = max(score, cluster_scores.get(cluster_id, 0.0))
+
+        return sorted(cluster_scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+    def query(self, foreign_principal, address=None, country=None):
+        """
+        Returns a list of (cluster_id, score) tuples for indexed records similar
+        to the given principal, best first. Does not modify the index.
+        """
+        normalized_name = normalize_name(foreign_principal)
+        if not normalized_name:
+            return []
+        name_signature, address_signature = self.signatures(
+            normalized_name, normalize_address(address))
+        return self.match_signatures(name_signature, address_signature, normalize_text(country))
+
+    def add(self, foreign_principal, address=None, country=None):
+        """
+        Inserts a principal and returns its cluster id.
+        Returns None when the name normalizes to nothing.
+        An already indexed country, name and address is not inserted again.
+        """
+        normalized_name = normalize_name(foreign_principal)
+        if not normalized_name:
+            return None
+        normalized_address = normalize_address(address)
+        normalized_country = normalize_text(country)
+
+        record_key = '{country}|{name}|{address}'.format(
+            country=normalized_country, name=normalized_name, address=normalized_address)
+        if record_key in self.record_keys:
+            return self.records[self.record_keys[record_key]]['cluster']
+
+        name_signature, address_signature = self.signatures(normalized_name, normalized_address)
+        matches = self.match_signatures(name_signature, address_signature, normalized_country)
+        if matches:
+            # Best match only. Merging the other matched clusters would orphan their ids.
+            cluster_id = matches[0][0]
+        else:
+            cluster_id = self.next_cluster_id
+            self.next_cluster_id += 1
+
+        record_id = len(self.records)
+        self.records.append({
+            'key': record_key,
+            'country': normalized_country,
+            'name': name_signature,
+            'address': address_signature,
+            'cluster': cluster_id,
+        })
+        self.record_keys[record_key] = record_id
+        for band_key in self.band_keys(name_signature, normalized_country):
+            self.buckets.setdefault(band_key, []).append(record_id)
+
+        return cluster_id
+
+    def to_dict(self):
+        return {
+            'num_perm': self.hasher.num_perm,
+            'seed': self.hasher.seed,
+            'bands': self.bands,
+            'threshold': self.threshold,
+            'address_weight': self.address_weight,
+            'next_cluster_id': self.next_cluster_id,
+            'records': self.records,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(
+            num_perm=data['num_perm'],
+            bands=data['bands'],
+            threshold=data['threshold'],
+            address_weight=data['address_weight'],
+            seed=data['seed'])
+        index.next_cluster_id = data['next_cluster_id']
+        for record in data['records']:
+            record_id = len(index.records)
+            index.records.append(record)
+            index.record_keys[record['key']] = record_id
+            for band_key in index.band_keys(record['name'], record['country']):
+                index.buckets.setdefault(band_key, []).append(record_id)
+        return index
+
+    def save(self, path):
+        dump_json_atomically(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Loads the index stored at path, or returns a new index built with kwargs
+        if nothing has been stored there yet.
+        """
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, 'r') as index_file:
+            return cls.from_dict(json.load(index_file))
@@ -47,6 +47,8 @@ class FaraForeignPrincipalItem(Item):
             lambda date_string: arrow.get(date_string, 'MM/DD/YYYY').isoformat()),
         output_processor=TakeFirst()
     )
+    # Set by EntityResolutionPipeline.
+    cluster_id = Field()
 
 
 class FaraForeignPrincipalItemLoader(ItemLoader):
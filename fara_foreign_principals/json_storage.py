@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+
+def dump_json_atomically(data, path):
+    """
+    Writes data as json to path without ever leaving a partly written file behind.
+    The json goes to a temp file in the same directory which then replaces path,
+    so a process killed mid write keeps the previous file intact.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=directory, prefix='.{name}.'.format(name=os.path.basename(path)), suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w') as temp_file:
+            json.dump(data, temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
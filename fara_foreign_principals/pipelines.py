@@ -5,7 +5,37 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: http://doc.scrapy.org/en/latest/topics/item-pipeline.html
 
+from .entity_resolution import ForeignPrincipalIndex
+
 
 class FaraForeignPrincipalsPipeline(object):
     def process_item(self, item, spider):
         return item
+
+
+class EntityResolutionPipeline(object):
+    """
+    Links the same foreign principal across registrants and across crawls.
+    Loads the index stored by the previous run, inserts every scraped principal
+    and writes its cluster id onto the item. The index is stored back on close.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.index = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(index_path=crawler.settings.get(
+            'ENTITY_INDEX_PATH', 'fara_entity_index.json'))
+
+    def open_spider(self, spider):
+        self.index = ForeignPrincipalIndex.load(self.index_path)
+
+    def close_spider(self, spider):
+        self.index.save(self.index_path)
+
+    def process_item(self, item, spider):
+        item['cluster_id'] = self.index.add(
+            item.get('foreign_principal'), item.get('address'), item.get('country'))
+        return item
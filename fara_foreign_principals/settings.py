@@ -65,9 +65,20 @@ CONCURRENT_REQUESTS = 16
 
 # Configure item pipelines
 # See http://scrapy.readthedocs.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
+ITEM_PIPELINES = {
 #    'fara_foreign_principals.pipelines.FaraForeignPrincipalsPipeline': 300,
-#}
+    'fara_foreign_principals.pipelines.EntityResolutionPipeline': 400,
+}
+
+# Where EntityResolutionPipeline keeps its foreign principal index between runs.
+ENTITY_INDEX_PATH = 'fara_entity_index.json'
+
+# Compare the listing total and first window against the previous run before crawling.
+# Unchanged listings end the run, changed ones are crawled from the latest foreign principal
+# registration date of the previous run, less LISTING_OVERLAP_DAYS for back-dated rows.
+CONDITIONAL_REFRESH = False
+LISTING_STATE_PATH = 'fara_listing_state.json'
+LISTING_OVERLAP_DAYS = 30
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See http://doc.scrapy.org/en/latest/topics/autothrottle.html
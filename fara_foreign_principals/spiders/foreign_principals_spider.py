@@ -7,9 +7,13 @@ from scrapy.loader import ItemLoader
 from difflib import SequenceMatcher
 
 import copy
+import hashlib
+import json
+import os
 import arrow
 
 from ..items import FaraForeignPrincipalItem, FaraForeignPrincipalItemLoader
+from ..json_storage import dump_json_atomically
 from ..fara_exceptions import (
     ApexFieldMissingError,
     ApexFieldMultipleValuesError,
@@ -23,11 +27,55 @@ class ForeignPrincipalsSpider(scrapy.Spider):
     start_urls = [
         'https://efile.fara.gov/pls/apex/f?p=171:130:::NO:RP,130:P130_DATERANGE:N',
     ]
+    # Unfiltered listing, RIR resets any filter left over in the apex session.
+    full_listing_url = 'https://efile.fara.gov/pls/apex/f?p=171:130:::NO:RP,130,RIR:P130_DATERANGE:N'
+    # Same listing with an interactive report filter on the foreign principal registration date.
+    daterange_url = (
+        'https://efile.fara.gov/pls/apex/f?p=171:130:::NO:RP,130,RIR:'
+        'P130_DATERANGE,IRGTE_FP_REG_DATE:N,{since_date}'
+    )
+
+    # Data rows of the apex report. Country break headings and column headers are th only rows.
+    listing_rows_xpath = (
+        '//div[@id="apexir_DATA_PANEL"]//table[@class="apexir_WORKSHEET_DATA"]'
+        '//tr[@class="odd" or @class="even"][td]'
+    )
 
     #Will be set to a dict containing apex application data.
     apex_metadata = None
     #Will be set to total number of expected results.
     total_records = None
+    #Will be set to a dict with the total, first window fingerprint and latest registration date seen.
+    #Only set once every expected listing row has been extracted, closed() stores it.
+    listing_state = None
+    #Listing state observed by this run while its rows are still being extracted.
+    pending_listing_state = None
+    #Will be set to the listing_state stored by the previous run, if any.
+    previous_listing_state = None
+    #Listing rows to extract before pending_listing_state is complete, and rows extracted so far.
+    expected_listing_rows = None
+    extracted_listing_rows = 0
+
+    # Crawler stats which mean some request or callback failed during the run.
+    failure_stats_prefixes = (
+        'spider_exceptions/',
+        'downloader/exception_count',
+        'httperror/response_ignored_count',
+        'retry/max_reached',
+    )
+
+    #Set from the CONDITIONAL_REFRESH, LISTING_STATE_PATH and LISTING_OVERLAP_DAYS settings.
+    conditional_refresh = False
+    listing_state_path = None
+    listing_overlap_days = 30
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(ForeignPrincipalsSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.conditional_refresh = crawler.settings.getbool('CONDITIONAL_REFRESH', False)
+        spider.listing_state_path = crawler.settings.get('LISTING_STATE_PATH')
+        spider.listing_overlap_days = crawler.settings.getint('LISTING_OVERLAP_DAYS', 30)
+        return spider
 
     def get_next_page_post_body_generator(self, total_rows, rows_per_page):
         """
@@ -60,7 +108,81 @@ class ForeignPrincipalsSpider(scrapy.Spider):
 
 
     def parse(self, response):
+        """
+        Pre-checks the listing before crawling it when conditional_refresh is set.
+        * ends the run if the total and first window are the same as the previous run.
+        * otherwise crawls only the foreign principals registered since the latest
+          registration date of the previous run, less listing_overlap_days.
+        Falls back to a full crawl when there is no previous run to compare with.
+
+        Registration dates are the site's own, so no timezone is involved. The overlap
+        picks up rows posted after the previous run with an earlier registration date.
+        """
         self.set_metadata_from_initial_page_table(response)
+        if not self.conditional_refresh:
+            for request in self.parse_listing(response):
+                yield request
+            return
+
+        self.previous_listing_state = self.load_listing_state()
+        previous_listing_state = self.previous_listing_state or {}
+        self.pending_listing_state = {
+            'total_records': self.total_records,
+            'fingerprint': self.get_listing_fingerprint(response),
+            'max_fp_reg_date': previous_listing_state.get('max_fp_reg_date'),
+        }
+
+        if previous_listing_state.get('max_fp_reg_date') is None:
+            for request in self.parse_listing(response):
+                yield request
+        elif self.listing_unchanged(previous_listing_state, self.pending_listing_state):
+            self.logger.info('Listing unchanged since the previous run, skipping crawl.')
+        else:
+            since_date = arrow.get(previous_listing_state['max_fp_reg_date'], 'MM/DD/YYYY').shift(
+                days=-self.listing_overlap_days).format('MM/DD/YYYY')
+            yield scrapy.http.Request(
+                self.daterange_url.format(since_date=since_date),
+                callback=self.parse_listing,
+                meta={'narrowed_since': since_date},
+                dont_filter=True
+            )
+
+    def parse_listing(self, response):
+        """
+        Requests every row of the listing in response.
+        For a narrowed listing, falls back to a full crawl if it holds fewer rows than
+        the total grew by, since some new rows must then fall outside the date range.
+        An empty narrowed listing, eg. when principals were only deregistered, ends the run.
+        """
+        narrowed_since = response.meta.get('narrowed_since')
+        if narrowed_since is not None:
+            added_records = (
+                self.pending_listing_state['total_records'] - self.previous_listing_state['total_records'])
+            if self.listing_is_empty(response):
+                narrowed_records = 0
+            else:
+                self.set_metadata_from_initial_page_table(response)
+                narrowed_records = self.total_records
+
+            if narrowed_records < added_records:
+                self.logger.info(
+                    'Listing since {since_date} has {narrowed_records} rows but the total grew by '
+                    '{added_records}, doing a full crawl.'.format(
+                        since_date=narrowed_since, narrowed_records=narrowed_records,
+                        added_records=added_records))
+                yield scrapy.http.Request(
+                    self.full_listing_url, callback=self.parse_listing, dont_filter=True)
+                return
+            if narrowed_records == 0:
+                self.logger.info(
+                    'No foreign principals registered since {since_date}, ending run.'.format(
+                        since_date=narrowed_since))
+                self.expect_listing_rows(0)
+                return
+        else:
+            self.set_metadata_from_initial_page_table(response)
+
+        self.expect_listing_rows(self.total_records)
         for next_page_post_request in self.get_next_page_post_body_generator(
                 self.total_records, self.total_records):
             yield scrapy.http.FormRequest(
@@ -69,6 +191,95 @@ class ForeignPrincipalsSpider(scrapy.Spider):
                 callback=self.extract_data_from_main_page
             )
 
+    def expect_listing_rows(self, row_count):
+        self.expected_listing_rows = row_count
+        self.extracted_listing_rows = 0
+        self.complete_listing_state()
+
+    def complete_listing_state(self):
+        """
+        Hands pending_listing_state over to closed() once every expected listing row is extracted.
+        Until then the previous run's state stays stored, so rows of an incomplete run
+        are crawled again instead of being taken as seen.
+        """
+        if (self.pending_listing_state is not None and self.expected_listing_rows is not None and
+                self.extracted_listing_rows >= self.expected_listing_rows):
+            self.listing_state = self.pending_listing_state
+
+    @classmethod
+    def get_listing_rows(cls, response):
+        return response.selector.xpath(cls.listing_rows_xpath)
+
+    @classmethod
+    def get_listing_fingerprint(cls, response):
+        """
+        sha1 of the text of every row in the listing window present in the response.
+        """
+        rows = cls.get_listing_rows(response)
+        rows_text = [' '.join(' '.join(row.xpath('.//td//text()').extract()).split()) for row in rows]
+        return hashlib.sha1('\n'.join(rows_text).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def listing_is_empty(cls, response):
+        """
+        True when the listing in response has no rows.
+        apex may leave out the pagination for an empty report, so this is checked first.
+        """
+        return len(cls.get_listing_rows(response)) == 0
+
+    def update_max_fp_reg_date(self, date_string):
+        """
+        Tracks the latest registration date of the listing for conditional runs only.
+        A cell that isn't a date is skipped, the row itself still goes to the item loader.
+        """
+        if self.pending_listing_state is None or date_string is None:
+            return
+        date_string = date_string.strip()
+        try:
+            fp_reg_date = arrow.get(date_string, 'MM/DD/YYYY')
+        except (ValueError, arrow.parser.ParserError):
+            self.logger.warning(
+                'Skipping unparseable foreign principal registration date "{date_string}".'.format(
+                    date_string=date_string))
+            return
+        max_fp_reg_date = self.pending_listing_state['max_fp_reg_date']
+        if max_fp_reg_date is None or fp_reg_date > arrow.get(max_fp_reg_date, 'MM/DD/YYYY'):
+            self.pending_listing_state['max_fp_reg_date'] = date_string
+
+    @staticmethod
+    def listing_unchanged(previous_listing_state, listing_state):
+        return (
+            previous_listing_state['total_records'] == listing_state['total_records'] and
+            previous_listing_state['fingerprint'] == listing_state['fingerprint']
+        )
+
+    def load_listing_state(self):
+        if self.listing_state_path is None or not os.path.exists(self.listing_state_path):
+            return None
+        with open(self.listing_state_path, 'r') as listing_state_file:
+            return json.load(listing_state_file)
+
+    def run_failed(self):
+        crawler = getattr(self, 'crawler', None)
+        if crawler is None or crawler.stats is None:
+            return False
+        return any(
+            stat_name.startswith(self.failure_stats_prefixes)
+            for stat_name in crawler.stats.get_stats())
+
+    def closed(self, reason):
+        """
+        Stores the listing state for the next conditional run.
+        Only done for finished runs that extracted every listing row without a failed
+        request or callback, so an incomplete crawl gets picked up again.
+        """
+        if self.listing_state_path is None or self.listing_state is None:
+            return
+        if reason != 'finished' or self.run_failed():
+            self.logger.info('Run incomplete, keeping the previous listing state.')
+            return
+        dump_json_atomically(self.listing_state, self.listing_state_path)
+
     @staticmethod
     def parse_apex_xpath_element(selector, apex_field_id):
         """
@@ -185,10 +396,7 @@ class ForeignPrincipalsSpider(scrapy.Spider):
 
 
     def extract_data_from_main_page(self, response):
-        data_panel = response.selector.xpath('//div[@id="apexir_DATA_PANEL"]')
-        worksheet_data = data_panel.xpath('.//table[@class="apexir_WORKSHEET_DATA"]')
-
-        for row in worksheet_data.xpath('.//tr[@class="odd" or @class="even"][td]'):
+        for row in self.get_listing_rows(response):
             foreign_principal_row_data = {}
 
             partial_url = row.xpath('.//td[contains(@headers, "LINK")]/a/@href').extract_first()
@@ -214,6 +422,7 @@ class ForeignPrincipalsSpider(scrapy.Spider):
             #setting to ISO 8601 formatted representation.
             foreign_principal_row_data['date'] = row.xpath(
                 './/td[contains(@headers, "FP_REG_DATE")]/text()').extract_first()
+            self.update_max_fp_reg_date(foreign_principal_row_data['date'])
 
             # Ok so this is a bit tricky.
             # Seems like country is in a <th> tag where the id has a number at the end corresponsing to the country.
@@ -227,6 +436,7 @@ class ForeignPrincipalsSpider(scrapy.Spider):
                     country_number_id=country_number_id
                 )).extract_first()
 
+            self.extracted_listing_rows += 1
             yield scrapy.http.Request(
                 response.urljoin(partial_url),
                 callback=self.extract_data_from_exhibit_url_page,
@@ -234,6 +444,8 @@ class ForeignPrincipalsSpider(scrapy.Spider):
                 dont_filter=True
             )
 
+        self.complete_listing_state()
+
 
     def extract_data_from_exhibit_url_page(self, response):
         foreign_principal_item = copy.deepcopy(response.meta['foreign_principal_row_data'])
@@ -0,0 +1,93 @@
+import copy
+import pytest
+
+from ..items import FaraForeignPrincipalItem, FaraForeignPrincipalItemLoader
+from ..spiders.foreign_principals_spider import ForeignPrincipalsSpider
+from .foreign_principal_spider_test import mock_response_from_html
+from .fixture_generator import (
+    SampleDistribution,
+    generate_listing_page,
+    generate_listing_rows,
+    generate_detail_page,
+    generate_exhibit_rows
+)
+
+
+# 15 is one listing window, 515 is the size of the full sample listing.
+LISTING_SIZES = [15, 515]
+EXHIBIT_COUNTS = [2, 50]
+
+
+@pytest.fixture(scope='module')
+def distribution():
+    return SampleDistribution()
+
+
+@pytest.mark.parametrize('row_count', LISTING_SIZES)
+def test_benchmark_set_metadata_from_initial_page_table(benchmark, distribution, row_count):
+    mock_response = mock_response_from_html(
+        generate_listing_page(row_count, distribution=distribution), 'https://efile.fara.gov/pls/apex/')
+    foreign_principal_spider = ForeignPrincipalsSpider()
+
+    benchmark(foreign_principal_spider.set_metadata_from_initial_page_table, mock_response)
+
+    assert foreign_principal_spider.total_records == row_count
+
+
+@pytest.mark.parametrize('row_count', LISTING_SIZES)
+def test_benchmark_extract_data_from_main_page(benchmark, distribution, row_count):
+    mock_response = mock_response_from_html(
+        generate_listing_page(row_count, distribution=distribution), 'https://efile.fara.gov/pls/apex/')
+    foreign_principal_spider = ForeignPrincipalsSpider()
+
+    requests = benchmark(
+        lambda: list(foreign_principal_spider.extract_data_from_main_page(mock_response)))
+
+    assert len(requests) == row_count
+
+
+@pytest.mark.parametrize('exhibit_count', EXHIBIT_COUNTS)
+def test_benchmark_extract_data_from_exhibit_url_page(benchmark, distribution, exhibit_count):
+    row_data = generate_listing_rows(1, distribution=distribution)[0]
+    mock_response = mock_response_from_html(
+        generate_detail_page(exhibit_count, distribution=distribution),
+        'https://efile.fara.gov/pls/apex/f?p=171:200:::NO:RP,200:P200_REG_NUMBER,P200_DOC_TYPE,P200_COUNTRY:6065,Exhibit%20AB,AFGHANISTAN',
+        meta={'foreign_principal_row_data': row_data})
+    foreign_principal_spider = ForeignPrincipalsSpider()
+
+    items = benchmark(
+        lambda: list(foreign_principal_spider.extract_data_from_exhibit_url_page(mock_response)))
+
+    assert items[0]['exhibit_url'] is not None
+
+
+@pytest.mark.parametrize('exhibit_count', EXHIBIT_COUNTS + [500])
+def test_benchmark_get_exhibit_url_when_multiple_present(benchmark, distribution, exhibit_count):
+    exhibit_rows = generate_exhibit_rows(exhibit_count, distribution=distribution)
+    foreign_principal = exhibit_rows[0]['exhibit_foreign_principal'].strip()
+
+    # Selection writes scores and dates onto the row dicts, so every round gets fresh copies.
+    exhibit_url = benchmark.pedantic(
+        ForeignPrincipalsSpider.get_exhibit_url_when_multiple_present,
+        setup=lambda: ((copy.deepcopy(exhibit_rows), foreign_principal), {}),
+        rounds=20)
+
+    assert exhibit_url is not None
+
+
+@pytest.mark.parametrize('row_count', LISTING_SIZES)
+def test_benchmark_item_loader(benchmark, distribution, row_count):
+    listing_rows = generate_listing_rows(row_count, distribution=distribution)
+
+    def load_items():
+        items = []
+        for row_data in listing_rows:
+            foreign_principal_item_loader = FaraForeignPrincipalItemLoader(
+                item=FaraForeignPrincipalItem())
+            foreign_principal_item_loader.add_value(None, row_data)
+            items.append(foreign_principal_item_loader.load_item())
+        return items
+
+    items = benchmark(load_items)
+
+    assert len(items) == row_count
@@ -0,0 +1,88 @@
+import pytest
+
+from ..entity_resolution import (
+    normalize_name,
+    shingles,
+    ForeignPrincipalIndex
+)
+from ..fara_exceptions import UnexpectedValueError
+
+
+class TestEntityResolution:
+    def test_normalize_name(self):
+        actual_name = normalize_name('The Embassy of Côte d\'Ivoire,\xa0Inc. ')
+
+        expected_name = 'embassy cote d ivoire'
+        assert actual_name == expected_name
+
+    def test_shingles_of_short_text(self):
+        assert shingles('a') == {' a '}
+        assert shingles('') == set()
+
+    def test_same_principal_shares_cluster(self):
+        index = ForeignPrincipalIndex()
+        first_cluster_id = index.add(
+            'Taipei Economic and Cultural Representative Office (TECRO)',
+            ['4201 Wisconsin Avenue, NW', 'Washington\xa0\xa020016'])
+        second_cluster_id = index.add(
+            'Taipei Economic and Cultural Representative Office in the United States',
+            '4201 Wisconsin Avenue, NW, Washington  20016')
+        other_cluster_id = index.add('Government of Aruba', 'L.G. Smith Blvd. 76, Oranjestad')
+
+        assert first_cluster_id == second_cluster_id
+        assert other_cluster_id != first_cluster_id
+
+    def test_same_name_in_other_country_not_matched(self):
+        index = ForeignPrincipalIndex()
+        egypt_cluster_id = index.add('Ministry of Tourism', '1 Cairo St, Cairo', 'EGYPT')
+        jamaica_cluster_id = index.add('Ministry of Tourism', '99 Kingston Rd, Kingston', 'JAMAICA')
+
+        assert egypt_cluster_id != jamaica_cluster_id
+        assert index.add('Ministry of Tourism', 'Misr Travel Tower, Cairo', 'EGYPT') == egypt_cluster_id
+        assert index.query('Ministry of Tourism', country='JAMAICA')[0][0] == jamaica_cluster_id
+
+    def test_duplicate_principal_not_inserted_again(self):
+        index = ForeignPrincipalIndex()
+        first_cluster_id = index.add('Government of Aruba', 'L.G. Smith Blvd. 76, Oranjestad')
+        second_cluster_id = index.add('Government of  Aruba', 'L.G. Smith Blvd. 76, Oranjestad')
+
+        assert first_cluster_id == second_cluster_id
+        assert len(index.records) == 1
+
+    def test_empty_name_has_no_cluster(self):
+        index = ForeignPrincipalIndex()
+
+        assert index.add(None) is None
+        assert index.add(' , ') is None
+        assert index.query(None) == []
+
+    def test_clusters_are_not_merged(self):
+        # One row per band so both halves of the joined name come up as candidates.
+        index = ForeignPrincipalIndex(bands=64, threshold=0.35)
+        first_cluster_id = index.add('Republic of Turkey')
+        second_cluster_id = index.add('Gephardt Group')
+        joined_cluster_id = index.add('Republic of Turkey Gephardt Group')
+
+        assert first_cluster_id != second_cluster_id
+        assert joined_cluster_id == first_cluster_id
+        assert index.add('Gephardt Group') == second_cluster_id
+        assert index.query('Gephardt Group')[0][0] == second_cluster_id
+
+    def test_index_persists_across_runs(self, tmpdir):
+        index_path = str(tmpdir.join('index.json'))
+        index = ForeignPrincipalIndex.load(index_path)
+        cluster_id = index.add(
+            'Embassy of the Republic of Korea', '2450 Massachusetts Avenue, NW', 'KOREA, SOUTH')
+        index.save(index_path)
+
+        loaded_index = ForeignPrincipalIndex.load(index_path)
+        actual_matches = loaded_index.query('Embassy of Republic of Korea', country='KOREA, SOUTH')
+
+        assert actual_matches[0][0] == cluster_id
+        assert loaded_index.add(
+            'Embassy of the Republic of Korea', '2450 Massachusetts Avenue, NW', 'KOREA, SOUTH') == cluster_id
+        assert loaded_index.add('Government of Aruba') == cluster_id + 1
+
+    def test_bands_must_divide_num_perm(self):
+        with pytest.raises(UnexpectedValueError):
+            ForeignPrincipalIndex(num_perm=64, bands=10)
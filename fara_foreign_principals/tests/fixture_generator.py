@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+Synthesizes FARA apex listing and detail pages at arbitrary scale for tests and benchmarks.
+
+Values are drawn from sample_fara_foreign_principals.json so generated pages keep
+the real distribution of countries, registrants and exhibits per detail page.
+
+python -m fara_foreign_principals.tests.fixture_generator --rows 5000 --output-dir /tmp/fara_fixtures
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+
+import arrow
+
+from html import escape
+
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+    'sample_fara_foreign_principals.json')
+
+LISTING_PAGE_TEMPLATE = '''<html lang="en-us">
+<head><title>Active Foreign Principals by Country or Location  as of </title></head>
+<body><form action="wwv_flow.accept" method="post" name="wwv_flow" id="wwvFlowForm" novalidate >
+<input type="hidden" name="p_flow_id" value="171" id="pFlowId" /><input type="hidden" name="p_flow_step_id" value="130" id="pFlowStepId" /><input type="hidden" name="p_instance" value="15405200750185" id="pInstance" />
+<div id="apexir_WORKSHEET">
+<input type="hidden" id="apexir_WORKSHEET_ID" value="80340213897823017" />
+<input type="hidden" id="apexir_REPORT_ID" value="80341508791823021" />
+<div id="apexir_DATA_PANEL"><table summary="" cellpadding="0" cellspacing="0" border="0" width="100%">
+<tr><td><table summary="" cellpadding="0" cellspacing="0" border="0" class="apexir_WORKSHEET_DATA" id="80340213897823017">
+{rows}
+</table>
+{pagination}
+</table>
+</div>
+</div>
+</form></body>
+</html>
+'''
+
+PAGINATION_TEMPLATE = (
+    '<tr><td colspan="10" class="pagination" align="right">'
+    '<span class="fielddata"> 1 - {rows_in_window} of {total_records} </span></td></tr>'
+)
+
+# An empty report has a message in place of the pagination.
+NO_DATA_FOUND = '<tr><td><span class="nodatafound">No data found.</span></td></tr>'
+
+COUNTRY_HEADING_TEMPLATE = (
+    '<tr><th colspan="8" class="apexir_REPEAT_HEADING" id="BREAK_COUNTRY_NAME_{country_number}">'
+    'Country/Location Represented : <span class="apex_break_headers">{country}</span></th></tr>\n'
+    '<tr><th id="LINK"><span class="hideMeButHearMe">Link</span></th><th id="FP_NAME">Foreign Principal</th>'
+    '<th id="FP_REG_DATE">Foreign Principal<br>Registration Date</th><th id="ADDRESS_1">Address</th>'
+    '<th id="STATE">State</th><th id="REGISTRANT_NAME">Registrant</th><th id="REG_NUMBER">Registration #</th>'
+    '<th id="REG_DATE">Registration<br>Date</th></tr>\n'
+)
+
+LISTING_ROW_TEMPLATE = (
+    '<tr class="{row_class}"><td headers="LINK BREAK_COUNTRY_NAME_{country_number}">'
+    '<a href="f&#x3F;p&#x3D;171&#x3A;200&#x3A;0&#x3A;&#x3A;NO&#x3A;RP,200&#x3A;'
+    'P200_REG_NUMBER,P200_DOC_TYPE,P200_COUNTRY&#x3A;{reg_num},Exhibit&#x25;20AB,{url_country}" >'
+    '<img src="/i/view.gif" alt="View Documents"></a></td>'
+    '<td  align="left" headers="FP_NAME BREAK_COUNTRY_NAME_{country_number}">{foreign_principal}</td>'
+    '<td  align="left" headers="FP_REG_DATE BREAK_COUNTRY_NAME_{country_number}">{date}</td>'
+    '<td  align="left" headers="ADDRESS_1 BREAK_COUNTRY_NAME_{country_number}">{address}&nbsp;&nbsp;</td>'
+    '<td  align="left" headers="STATE BREAK_COUNTRY_NAME_{country_number}">{state}</td>'
+    '<td  align="left" headers="REGISTRANT_NAME BREAK_COUNTRY_NAME_{country_number}">{registrant}</td>'
+    '<td  align="center" headers="REG_NUMBER BREAK_COUNTRY_NAME_{country_number}">{reg_num}</td>'
+    '<td  align="left" headers="REG_DATE BREAK_COUNTRY_NAME_{country_number}">{date}</td></tr>\n'
+)
+
+DETAIL_PAGE_TEMPLATE = '''<html lang="en-us">
+<head><title>Documents</title></head>
+<body><form action="wwv_flow.accept" method="post" name="wwv_flow" id="wwvFlowForm" novalidate >
+<div id="apexir_WORKSHEET"><div id="apexir_DATA_PANEL">
+<table summary="" cellpadding="0" cellspacing="0" border="0" class="apexir_WORKSHEET_DATA">
+<tr><th id="DATE_STAMPED">Date Stamped</th><th id="DOCLINK">Document</th></tr>
+{rows}
+</table>
+</div></div>
+</form></body>
+</html>
+'''
+
+DETAIL_ROW_TEMPLATE = (
+    '<tr class="{row_class}"><td  align="left" headers="DATE_STAMPED">{exhibit_date}</td>'
+    '<td  align="left" headers="DOCLINK"><a href="{exhibit_url}" target="_Exhibit_AB">'
+    '<span>{exhibit_foreign_principal}</span></a></td></tr>\n'
+)
+
+
+class SampleDistribution(object):
+    """
+    Field values of the sample output and how often each occurs.
+    Sampling from the lists directly keeps the sample frequencies.
+    """
+
+    def __init__(self, sample_path=SAMPLE_PATH):
+        with open(sample_path, 'r') as sample_file:
+            sample_items = json.load(sample_file)
+
+        self.items = sample_items
+        self.countries = [item['country'] for item in sample_items]
+        self.registrants = [
+            (item['registrant'], item['reg_num']) for item in sample_items]
+        self.states = [item['state'] or '' for item in sample_items]
+        # Items sharing a registration number and country are listed on the same detail page.
+        self.exhibits_per_detail_page = list(collections.Counter(
+            (item['reg_num'], item['country']) for item in sample_items).values())
+
+
+def generate_listing_rows(row_count, seed=0, distribution=None):
+    """
+    Returns row_count dicts shaped like extract_data_from_main_page row data,
+    grouped and ordered by country like the apex report.
+    """
+    distribution = distribution or SampleDistribution()
+    generator = random.Random(seed)
+
+    rows = []
+    for row_number in range(row_count):
+        item = generator.choice(distribution.items)
+        registrant, reg_num = generator.choice(distribution.registrants)
+        rows.append({
+            'foreign_principal': '{name} {row_number}'.format(
+                name=item['foreign_principal'], row_number=row_number),
+            'address': (item['address'] or '').split(', '),
+            'state': generator.choice(distribution.states),
+            'registrant': registrant,
+            'reg_num': reg_num,
+            'date': arrow.get(item['date']).shift(days=-generator.randint(0, 3650)).format('MM/DD/YYYY'),
+            'country': generator.choice(distribution.countries),
+        })
+    return sorted(rows, key=lambda row: row['country'])
+
+
+def generate_listing_page(row_count, seed=0, total_records=None, distribution=None):
+    """
+    Returns html of an apex listing window holding row_count rows.
+    total_records defaults to row_count, ie. the whole listing in one window.
+    A row_count of 0 renders the empty report without pagination.
+    """
+    rows_html = []
+    country_numbers = {}
+    for row_number, row in enumerate(generate_listing_rows(row_count, seed, distribution)):
+        if row['country'] not in country_numbers:
+            country_numbers[row['country']] = len(country_numbers) + 1
+            rows_html.append(COUNTRY_HEADING_TEMPLATE.format(
+                country_number=country_numbers[row['country']], country=escape(row['country'])))
+        rows_html.append(LISTING_ROW_TEMPLATE.format(
+            row_class='even' if row_number % 2 == 0 else 'odd',
+            country_number=country_numbers[row['country']],
+            url_country=escape(row['country'].replace(' ', '%20')),
+            foreign_principal=escape(row['foreign_principal']),
+            date=row['date'],
+            address='<br>'.join(escape(line) for line in row['address']),
+            state=escape(row['state']),
+            registrant=escape(row['registrant']),
+            reg_num=row['reg_num']))
+
+    if row_count == 0:
+        pagination = NO_DATA_FOUND
+    else:
+        pagination = PAGINATION_TEMPLATE.format(
+            rows_in_window=row_count,
+            total_records=row_count if total_records is None else total_records)
+    return LISTING_PAGE_TEMPLATE.format(rows=''.join(rows_html), pagination=pagination)
+
+
+def generate_exhibit_rows(exhibit_count=None, seed=0, distribution=None):
+    """
+    Returns exhibit row data dicts as get_exhibit_url_when_multiple_present receives them.
+    Without exhibit_count the number of rows is drawn from the sample's exhibits per detail page.
+    """
+    distribution = distribution or SampleDistribution()
+    generator = random.Random(seed)
+    if exhibit_count is None:
+        exhibit_count = generator.choice(distribution.exhibits_per_detail_page)
+
+    reg_num = generator.choice(distribution.registrants)[1]
+    foreign_principals = [
+        generator.choice(distribution.items)['foreign_principal']
+        for _ in range(generator.choice(distribution.exhibits_per_detail_page))]
+
+    exhibit_rows = []
+    for exhibit_number in range(exhibit_count):
+        exhibit_date = arrow.get('2017-03-15').shift(days=-generator.randint(0, 3650))
+        exhibit_rows.append({
+            'exhibit_date': exhibit_date.format('MM/DD/YYYY'),
+            'exhibit_foreign_principal': generator.choice(foreign_principals) + ' ',
+            'exhibit_url': 'http://www.fara.gov/docs/{reg_num}-Exhibit-AB-{date}-{number}.pdf'.format(
+                reg_num=reg_num, date=exhibit_date.format('YYYYMMDD'), number=exhibit_number),
+        })
+    return exhibit_rows
+
+
+def generate_detail_page(exhibit_count=None, seed=0, distribution=None):
+    """
+    Returns html of an apex exhibit detail page.
+    """
+    exhibit_rows = generate_exhibit_rows(exhibit_count, seed, distribution)
+    return DETAIL_PAGE_TEMPLATE.format(rows=''.join(
+        DETAIL_ROW_TEMPLATE.format(
+            row_class='even' if exhibit_number % 2 == 0 else 'odd',
+            exhibit_date=exhibit_row['exhibit_date'],
+            exhibit_url=escape(exhibit_row['exhibit_url']),
+            exhibit_foreign_principal=escape(exhibit_row['exhibit_foreign_principal']))
+        for exhibit_number, exhibit_row in enumerate(exhibit_rows)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000, help='rows in the listing page.')
+    parser.add_argument('--exhibits', type=int, default=None, help='rows in the detail page.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='.')
+    args = parser.parse_args()
+
+    distribution = SampleDistribution()
+    pages = {
+        'listing_page_{rows}.html'.format(rows=args.rows): generate_listing_page(
+            args.rows, args.seed, distribution=distribution),
+        'detail_page.html': generate_detail_page(
+            args.exhibits, args.seed, distribution=distribution),
+    }
+    for file_name, page in pages.items():
+        with open(os.path.join(args.output_dir, file_name), 'w') as page_file:
+            page_file.write(page)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 import pytest
 import scrapy
+import json
 import os
+import re
 
 from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
 
 from ..spiders.foreign_principals_spider import ForeignPrincipalsSpider
+from .fixture_generator import generate_listing_page
 from ..fara_exceptions import (
     ApexFieldMissingError,
     ApexFieldMultipleValuesError,
@@ -84,6 +88,205 @@ class TestForeignPrincipalsSpider:
         assert actual_exhibit_url == expected_exhibit_url
 
 
+class TestConditionalRefresh:
+    def get_spider(self, tmpdir, previous_listing_state=None):
+        crawler = get_crawler(ForeignPrincipalsSpider, {
+            'CONDITIONAL_REFRESH': True,
+            'LISTING_STATE_PATH': str(tmpdir.join('listing_state.json'))
+        })
+        foreign_principal_spider = ForeignPrincipalsSpider.from_crawler(crawler)
+        if previous_listing_state is not None:
+            tmpdir.join('listing_state.json').write(json.dumps(previous_listing_state))
+        return foreign_principal_spider
+
+    def get_previous_listing_state(self, total_records):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        return {
+            'total_records': total_records,
+            'fingerprint': ForeignPrincipalsSpider.get_listing_fingerprint(mock_response),
+            'max_fp_reg_date': '03/01/2017'
+        }
+
+    def get_narrowed_response(self, foreign_principal_spider, row_count, fp_reg_date='02/15/2017'):
+        listing_html = re.sub(
+            r'(headers="FP_REG_DATE[^"]*">)[^<]*', r'\g<1>' + fp_reg_date,
+            generate_listing_page(row_count))
+        return mock_response_from_html(
+            listing_html, foreign_principal_spider.daterange_url.format(since_date='01/30/2017'),
+            meta={'narrowed_since': '01/30/2017'})
+
+    def test_listing_fingerprint_changes_with_rows(self):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        changed_mock_response = mock_response.replace(
+            body=mock_response.text.replace('Government of Aruba', 'Government of Aruba, Embassy'))
+
+        fingerprint = ForeignPrincipalsSpider.get_listing_fingerprint(mock_response)
+        assert fingerprint == ForeignPrincipalsSpider.get_listing_fingerprint(mock_response)
+        assert fingerprint != ForeignPrincipalsSpider.get_listing_fingerprint(changed_mock_response)
+
+    def test_full_crawl_without_previous_run(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(tmpdir)
+
+        actual_requests = list(foreign_principal_spider.parse(mock_response))
+
+        assert len(actual_requests) == 1
+        assert isinstance(actual_requests[0], scrapy.http.FormRequest)
+        assert foreign_principal_spider.pending_listing_state['total_records'] == 515
+        assert foreign_principal_spider.listing_state is None
+
+    def test_unchanged_listing_skips_crawl(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(
+            tmpdir, self.get_previous_listing_state(515))
+
+        actual_requests = list(foreign_principal_spider.parse(mock_response))
+
+        assert actual_requests == []
+
+    def test_changed_listing_crawls_since_previous_run_with_overlap(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(
+            tmpdir, self.get_previous_listing_state(514))
+
+        actual_requests = list(foreign_principal_spider.parse(mock_response))
+
+        # Previous latest registration date 03/01/2017 less the 30 day overlap.
+        expected_url = (
+            'https://efile.fara.gov/pls/apex/f?p=171:130:::NO:RP,130,RIR:'
+            'P130_DATERANGE,IRGTE_FP_REG_DATE:N,01/30/2017'
+        )
+        assert len(actual_requests) == 1
+        assert actual_requests[0].url == expected_url
+        assert actual_requests[0].callback == foreign_principal_spider.parse_listing
+
+    def test_back_dated_row_crawled(self, tmpdir):
+        """A row posted after the previous run but registered before its latest registration date.
+        """
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(
+            tmpdir, self.get_previous_listing_state(514))
+        list(foreign_principal_spider.parse(mock_response))
+
+        narrowed_response = self.get_narrowed_response(foreign_principal_spider, 1)
+        actual_requests = list(foreign_principal_spider.parse_listing(narrowed_response))
+        assert len(actual_requests) == 1
+        assert isinstance(actual_requests[0], scrapy.http.FormRequest)
+
+        actual_rows = list(foreign_principal_spider.extract_data_from_main_page(narrowed_response))
+        assert actual_rows[0].meta['foreign_principal_row_data']['date'] == '02/15/2017'
+        assert foreign_principal_spider.listing_state['max_fp_reg_date'] == '03/01/2017'
+        assert foreign_principal_spider.listing_state['total_records'] == 515
+
+    def test_narrowed_listing_short_of_new_rows_does_full_crawl(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(
+            tmpdir, self.get_previous_listing_state(510))
+        list(foreign_principal_spider.parse(mock_response))
+
+        narrowed_response = self.get_narrowed_response(foreign_principal_spider, 1)
+        actual_requests = list(foreign_principal_spider.parse_listing(narrowed_response))
+
+        assert len(actual_requests) == 1
+        assert actual_requests[0].url == foreign_principal_spider.full_listing_url
+
+    def test_empty_narrowed_listing_ends_run(self, tmpdir):
+        """Only a deregistration, the total dropped and apex renders no data found.
+        """
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(
+            tmpdir, self.get_previous_listing_state(516))
+        list(foreign_principal_spider.parse(mock_response))
+
+        narrowed_response = self.get_narrowed_response(foreign_principal_spider, 0)
+        actual_requests = list(foreign_principal_spider.parse_listing(narrowed_response))
+
+        assert actual_requests == []
+        assert foreign_principal_spider.listing_state['total_records'] == 515
+
+    def test_max_fp_reg_date_tracked(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(tmpdir)
+        list(foreign_principal_spider.parse(mock_response))
+        list(foreign_principal_spider.extract_data_from_main_page(mock_response))
+
+        assert foreign_principal_spider.pending_listing_state['max_fp_reg_date'] == '04/16/2017'
+
+    def test_max_fp_reg_date_not_tracked_without_conditional_refresh(self):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = ForeignPrincipalsSpider()
+        list(foreign_principal_spider.parse(mock_response))
+        list(foreign_principal_spider.extract_data_from_main_page(mock_response))
+
+        assert foreign_principal_spider.pending_listing_state is None
+        assert foreign_principal_spider.listing_state is None
+
+    def test_unparseable_fp_reg_date_skipped(self, tmpdir):
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        bad_date_response = mock_response.replace(
+            body=mock_response.text.replace('>07/03/2014<', '>&nbsp;<').replace('>04/16/2017<', '>N/A<'))
+        foreign_principal_spider = self.get_spider(tmpdir)
+        list(foreign_principal_spider.parse(bad_date_response))
+
+        actual_rows = list(foreign_principal_spider.extract_data_from_main_page(bad_date_response))
+
+        assert len(actual_rows) == 15
+        assert foreign_principal_spider.pending_listing_state['max_fp_reg_date'] == '04/14/2017'
+
+    def test_listing_state_stored_on_finish(self, tmpdir):
+        mock_response = mock_response_from_html(
+            generate_listing_page(3), 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(tmpdir)
+        list(foreign_principal_spider.parse(mock_response))
+        list(foreign_principal_spider.extract_data_from_main_page(mock_response))
+
+        foreign_principal_spider.closed('shutdown')
+        assert foreign_principal_spider.load_listing_state() is None
+
+        foreign_principal_spider.closed('finished')
+        assert foreign_principal_spider.load_listing_state() == foreign_principal_spider.pending_listing_state
+        assert foreign_principal_spider.load_listing_state()['total_records'] == 3
+
+    def test_listing_state_kept_when_listing_callback_never_runs(self, tmpdir):
+        """The narrowed listing request fails, so its rows must be crawled by the next run.
+        """
+        mock_response = mock_response_from_file(
+            'sample_main_page.html', 'https://efile.fara.gov/pls/apex/')
+        previous_listing_state = self.get_previous_listing_state(514)
+        foreign_principal_spider = self.get_spider(tmpdir, previous_listing_state)
+        list(foreign_principal_spider.parse(mock_response))
+        foreign_principal_spider.closed('finished')
+
+        assert foreign_principal_spider.load_listing_state() == previous_listing_state
+
+        next_foreign_principal_spider = self.get_spider(tmpdir)
+        actual_requests = list(next_foreign_principal_spider.parse(mock_response))
+        assert len(actual_requests) == 1
+        assert actual_requests[0].meta['narrowed_since'] == '01/30/2017'
+
+    def test_listing_state_kept_on_spider_errors(self, tmpdir):
+        mock_response = mock_response_from_html(
+            generate_listing_page(3), 'https://efile.fara.gov/pls/apex/')
+        foreign_principal_spider = self.get_spider(tmpdir)
+        list(foreign_principal_spider.parse(mock_response))
+        list(foreign_principal_spider.extract_data_from_main_page(mock_response))
+
+        foreign_principal_spider.crawler.stats.inc_value('spider_exceptions/ValueError')
+        foreign_principal_spider.closed('finished')
+
+        assert foreign_principal_spider.load_listing_state() is None
+
 def mock_response_from_file(file_name, url):
     """
     Create a Scrapy mock HTTP response from a HTML file
@@ -105,3 +308,11 @@ def mock_response_from_file(file_name, url):
     response = HtmlResponse(
         url=url, request=request, body=file_content, encoding='utf-8')
     return response
+
+
+def mock_response_from_html(html, url, meta=None):
+    """
+    Create a Scrapy mock HTTP response from a HTML string, eg. a generated fixture.
+    """
+    request = Request(url=url, meta=meta)
+    return HtmlResponse(url=url, request=request, body=html, encoding='utf-8')
@@ -0,0 +1,24 @@
+import json
+import pytest
+
+from ..json_storage import dump_json_atomically
+
+
+class TestJsonStorage:
+    def test_dump_json_atomically(self, tmpdir):
+        path = str(tmpdir.join('state.json'))
+        dump_json_atomically({'total_records': 514}, path)
+        dump_json_atomically({'total_records': 515}, path)
+
+        assert json.load(open(path)) == {'total_records': 515}
+        assert tmpdir.listdir() == [tmpdir.join('state.json')]
+
+    def test_failed_dump_keeps_previous_file(self, tmpdir):
+        path = str(tmpdir.join('state.json'))
+        dump_json_atomically({'total_records': 514}, path)
+
+        with pytest.raises(TypeError):
+            dump_json_atomically({'total_records': object()}, path)
+
+        assert json.load(open(path)) == {'total_records': 514}
+        assert tmpdir.listdir() == [tmpdir.join('state.json')]